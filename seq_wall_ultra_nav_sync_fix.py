@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import os, re, platform, hashlib
+import os, re, platform, hashlib, mmap, struct, threading, queue, itertools, weakref, time
+from collections import defaultdict, OrderedDict
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Callable, Iterable, TYPE_CHECKING
+
+from PIL import Image, ImageColor
+
+if TYPE_CHECKING:
+    from PIL import ImageTk
+
+import numpy as np
 
 try:
-    from PIL import Image, ImageTk, ImageChops, Image
-except Exception as e:
-    from PIL import Image, ImageTk, ImageChops
+    import xxhash
+except ImportError:
+    xxhash = None
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, font as tkfont
 
 BG_WINDOW = "#111111"
 BG_PANEL  = "#1a1a1a"
@@ -19,11 +27,23 @@ BG_TILE   = "#222222"
 FG_TEXT   = "#dddddd"
 BORDER    = "#444444"
 
-SEQ_PATTERNS = [
-    re.compile(r'^(?P<prefix>.*?)[._-](?P<index>\d{3,6})\.(?P<ext>png|jpg|jpeg|bmp|tif|tiff)$', re.IGNORECASE),
-    re.compile(r'^(?P<prefix>.*?)(?P<index>\d{3,6})\.(?P<ext>png|jpg|jpeg|bmp|tif|tiff)$', re.IGNORECASE),
-]
 SUPPORTED_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+# one pattern per extension, picked via splitext, so no alternation per match
+SEQ_PATTERNS = {
+    ext: re.compile(rf'^(?P<prefix>.*?)[._-]?(?P<index>\d{{3,6}})\{ext}$', re.IGNORECASE)
+    for ext in SUPPORTED_EXTS
+}
+CACHE_DIR_NAME = ".seqwall_cache"
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) * 4)  # directory walks are I/O-bound
+SUBDIR_CACHE_TTL = 30.0  # seconds
+MEM_CACHE_MIN = 256  # frames kept in memory, at least
+ATLAS_OPEN_MAX = 64  # every open atlas mmap holds a file descriptor; macOS defaults to 256
+TILE_PAD = 4
+CAPTION_H = 30
+DRAIN_PER_POLL = 64
+DRAIN_POLL_MS = 16  # results are picked up on their own timer, independent of the FPS tick
+PREFETCH_FRAMES = 8
+PREFETCH_PRIORITY = 1e6  # added to the viewport distance so on-screen frames always win
 
 @dataclass
 class SequenceItem:
@@ -34,100 +54,328 @@ class SequenceItem:
     frames: List[str]
     digits: int
 
-def find_sequences(root: str) -> List[SequenceItem]:
+def _scan_dir(dirpath: str, filenames: List[str], sequences: Dict[str, SequenceItem]):
+    groups: Dict[Tuple[str, str], List[Tuple[int, str]]] = defaultdict(list)
+    first: Dict[Tuple[str, str], Tuple[int, int]] = {}  # min index, its digit width
+    for f in filenames:
+        ext = os.path.splitext(f)[1].lower()
+        pat = SEQ_PATTERNS.get(ext)
+        if pat is None:
+            continue
+        m = pat.match(f)
+        if not m:
+            continue
+        idx_str = m.group('index')
+        idx = int(idx_str)
+        gk = (m.group('prefix'), ext[1:])
+        groups[gk].append((idx, f))
+        if gk not in first or idx < first[gk][0]:
+            first[gk] = (idx, len(idx_str))
+    for (prefix, ext), items in groups.items():
+        if len(items) >= 3:
+            items.sort()
+            key = os.path.join(dirpath, f"{prefix}[##].{ext}")
+            frames = [os.path.join(dirpath, fn) for _, fn in items]
+            sequences[key] = SequenceItem(
+                key=key, folder=dirpath, prefix=prefix, ext=ext, frames=frames, digits=first[(prefix, ext)][1]
+            )
+
+def _list_dir(dirpath: str) -> Tuple[List[str], List[str]]:
+    subdirs, filenames = [], []
+    try:
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink() and entry.name != CACHE_DIR_NAME:
+                            subdirs.append(entry.path)
+                    else:
+                        filenames.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return subdirs, filenames
+
+def find_sequences_subtree(root: str, cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, SequenceItem]:
     sequences: Dict[str, SequenceItem] = {}
-    for dirpath, _, filenames in os.walk(root):
-        candidates = [f for f in filenames if f.lower().endswith(SUPPORTED_EXTS)]
-        temp: Dict[Tuple[str, str], List[Tuple[int, str, int]]] = {}
-        for f in candidates:
-            for pat in SEQ_PATTERNS:
-                m = pat.match(f)
-                if m:
-                    prefix = m.group('prefix')
-                    ext = m.group('ext').lower()
-                    idx_str = m.group('index')
-                    try:
-                        idx = int(idx_str)
-                    except ValueError:
-                        continue
-                    temp.setdefault((prefix, ext), []).append((idx, f, len(idx_str)))
-                    break
-        for (prefix, ext), items in temp.items():
-            items.sort(key=lambda x: x[0])
-            if len(items) >= 3:
-                key = os.path.join(dirpath, f"{prefix}[##].{ext}")
-                frames = [os.path.join(dirpath, fn) for _, fn, _ in items]
-                digits = items[0][2]
-                sequences[key] = SequenceItem(
-                    key=key, folder=dirpath, prefix=prefix, ext=ext, frames=frames, digits=digits
-                )
+    stack = [root]
+    while stack:
+        if cancelled and cancelled():
+            break  # a newer scan replaced this one; whatever we have is discarded anyway
+        dirpath = stack.pop()
+        subdirs, filenames = _list_dir(dirpath)
+        stack.extend(subdirs)
+        _scan_dir(dirpath, filenames, sequences)
+    return sequences
+
+def find_sequences(root: str, progress: Optional[Callable[[int], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> List[SequenceItem]:
+    # per-shot subfolders are independent, so walk each top-level one on its own thread
+    subdirs, filenames = _list_dir(root)
+    sequences: Dict[str, SequenceItem] = {}
+    _scan_dir(root, filenames, sequences)
+    if subdirs:
+        with ThreadPoolExecutor(max_workers=min(SCAN_WORKERS, len(subdirs))) as ex:
+            for part in ex.map(lambda d: find_sequences_subtree(d, cancelled), subdirs):
+                sequences.update(part)
+                if progress:
+                    progress(len(sequences))  # once per top-level folder, not per file
     return sorted(sequences.values(), key=lambda s: s.key.lower())
 
+def _is_opaque(img: Image.Image) -> bool:
+    if img.mode in ("RGB", "L"):
+        return True
+    return img.mode == "RGBA" and img.getextrema()[3] == (255, 255)
+
 def resize_rgba_contain_premultiplied(img: Image.Image, box: Tuple[int,int]) -> Image.Image:
-    if img.mode != "RGBA":
+    if img.mode not in ("RGB", "L", "RGBA"):
         img = img.convert("RGBA")
     w, h = img.size
     dst_w, dst_h = box
     scale = min(dst_w / max(1,w), dst_h / max(1,h))
     new_w = max(1, int(w * scale))
     new_h = max(1, int(h * scale))
-    r, g, b, a = img.split()
-    r = ImageChops.multiply(r, a).resize((new_w, new_h), Image.LANCZOS)
-    g = ImageChops.multiply(g, a).resize((new_w, new_h), Image.LANCZOS)
-    b = ImageChops.multiply(b, a).resize((new_w, new_h), Image.LANCZOS)
-    a = a.resize((new_w, new_h), Image.LANCZOS)
-    pm = Image.merge("RGBA", (r, g, b, a))
-    return pm
-
-def compose_on_bg(img_rgba: Image.Image, size: int, bg_color: str) -> Image.Image:
-    if img_rgba.mode != "RGBA":
-        img_rgba = img_rgba.convert("RGBA")
-    bg = Image.new("RGBA", (size, size), bg_color)
-    x = (size - img_rgba.width) // 2
-    y = (size - img_rgba.height) // 2
-    bg.alpha_composite(img_rgba, (x, y))
-    return bg.convert("RGB")
+    opaque = _is_opaque(img)
+    # nothing to premultiply when opaque; otherwise Pillow resizes RGBa natively in one pass
+    mode = "RGB" if opaque else "RGBa"
+    if img.mode != mode:
+        img = img.convert(mode)
+    # box-reduce by an integer factor first so LANCZOS sees at most ~2x the target
+    factor = max(1, min(w // new_w, h // new_h) // 2)
+    if factor >= 2:
+        img = img.reduce(factor)
+    # stays premultiplied (RGBa); compose_on_bg blends it without un-premultiplying
+    return img.resize((new_w, new_h), Image.LANCZOS)
+
+def decode_frame(path: str, target: int) -> Image.Image:
+    im = Image.open(path)
+    # JPEG only: let libjpeg downscale during IDCT; always before load()
+    im.draft("RGB", (target*2, target*2))
+    im.load()
+    return im
+
+def compose_on_bg(img: Image.Image, size: int, bg_color: str) -> Image.Image:
+    x = (size - img.width) // 2
+    y = (size - img.height) // 2
+    bg = Image.new("RGB", (size, size), bg_color)
+    if img.mode != "RGB":
+        if img.mode != "RGBa":
+            img = img.convert("RGBa")
+        # premultiplied "over": out = src + bg * (1 - a), one vectorized pass
+        arr = np.asarray(img)
+        inv_a = 255 - arr[..., 3:4].astype(np.uint16)
+        bg_rgb = np.array(ImageColor.getrgb(bg_color)[:3], dtype=np.uint16)
+        rgb = arr[..., :3] + (bg_rgb * inv_a + 127) // 255
+        img = Image.fromarray(np.minimum(rgb, 255).astype(np.uint8))
+    bg.paste(img, (x, y))
+    return bg
+
+_imagetk = None
+
+def _get_imagetk():
+    # PIL.ImageTk drags in the Tk bridge; import it the first time a tile needs a surface
+    global _imagetk
+    if _imagetk is None:
+        from PIL import ImageTk
+        _imagetk = ImageTk
+    return _imagetk
+
+def _key_hash(key: str) -> str:
+    # only used as a file name, so a fast non-cryptographic hash is enough
+    data = key.encode("utf-8")
+    if xxhash is not None:
+        return xxhash.xxh3_128(data).hexdigest()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+ATLAS_MAGIC = b"SQWA"
+ATLAS_VERSION = 2
+ATLAS_HEADER = struct.Struct("<4sHHI")  # magic, version, tile size, frame count
+
+def _pack_rgb565(image_rgb: Image.Image) -> np.ndarray:
+    arr = np.asarray(image_rgb.convert("RGB"), dtype=np.uint16)
+    return ((arr[..., 0] >> 3) << 11) | ((arr[..., 1] >> 2) << 5) | (arr[..., 2] >> 3)
+
+def _unpack_rgb565(px: np.ndarray, size: int) -> Image.Image:
+    r = (px >> 11) & 0x1F
+    g = (px >> 5) & 0x3F
+    b = px & 0x1F
+    # replicate the high bits into the low ones so 0x1F maps back to 255
+    rgb = np.stack(((r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)), axis=-1)
+    return Image.fromarray(rgb.astype(np.uint8).reshape(size, size, 3))
+
+# one mmapped file per (sequence, size): header, per-frame flags, fixed-stride RGB565 tiles
+class ThumbAtlas:
+    def __init__(self, path: str, size: int, count: int):
+        self.size = size
+        self.count = count
+        self.stride = size * size * 2  # display-only thumbnails: 16 bits per pixel is plenty
+        self.flags_off = ATLAS_HEADER.size
+        self.tiles_off = self.flags_off + count
+        total = self.tiles_off + count * self.stride
+        header = ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, size, count)
+        mode = "r+b" if os.path.exists(path) else "w+b"
+        with open(path, mode) as f:
+            if f.read(ATLAS_HEADER.size) != header or os.fstat(f.fileno()).st_size != total:
+                # new or stale atlas: start over with every frame marked missing
+                f.seek(0)
+                f.truncate(0)
+                f.write(header)
+                f.truncate(total)
+            self.mm = mmap.mmap(f.fileno(), total)
+
+    def has(self, frame_idx: int) -> bool:
+        return 0 <= frame_idx < self.count and bool(self.mm[self.flags_off + frame_idx])
+
+    def get(self, frame_idx: int) -> Optional[Image.Image]:
+        if not self.has(frame_idx):
+            return None
+        return _unpack_rgb565(self._tile(frame_idx), self.size)
+
+    def put(self, frame_idx: int, image_rgb: Image.Image):
+        if not (0 <= frame_idx < self.count) or image_rgb.size != (self.size, self.size):
+            return
+        self._tile(frame_idx)[:] = _pack_rgb565(image_rgb).ravel()
+        self.mm[self.flags_off + frame_idx] = 1
+
+    def _tile(self, frame_idx: int) -> np.ndarray:
+        # uint16 view straight onto the mmap, no copy; callers must not keep it past the call
+        off = self.tiles_off + frame_idx * self.stride
+        return np.frombuffer(self.mm, dtype="<u2", count=self.size * self.size, offset=off)
+
+    def close(self):
+        self.mm.close()
 
 class ThumbCache:
     def __init__(self, root_dir: str, size: int):
-        self.mem: Dict[Tuple[str,int,int], ImageTk.PhotoImage] = {}
+        # bounded LRU of raw RGB tile bytes; the mmap atlas backs everything evicted
+        self.mem: "OrderedDict[Tuple[str,int,int], bytes]" = OrderedDict()
+        self.max_items = MEM_CACHE_MIN
+        # LRU of open atlases; atlas_lock also covers every access to them, so one is
+        # only closed when no worker holds a view onto its mmap
+        self.atlases: "OrderedDict[str, Optional[ThumbAtlas]]" = OrderedDict()
+        self.atlas_lock = threading.Lock()
+        self.closed = False
         self.root_dir = root_dir
         self.size = size
-        self.cache_dir = os.path.join(root_dir, ".seqwall_cache")
+        self.cache_dir = os.path.join(root_dir, CACHE_DIR_NAME)
         os.makedirs(self.cache_dir, exist_ok=True)
 
     def key(self, path: str, frame_idx: int) -> Tuple[str,int,int]:
         return (path, self.size, frame_idx)
 
-    def disk_path(self, path: str, frame_idx: int) -> str:
-        h = hashlib.sha1(f"{path}|{self.size}|{frame_idx}".encode("utf-8")).hexdigest()
-        return os.path.join(self.cache_dir, f"{h}.png")
-
-    def get(self, path: str, frame_idx: int) -> Optional[ImageTk.PhotoImage]:
-        k = self.key(path, frame_idx)
-        if k in self.mem:
-            return self.mem[k]
-        dp = self.disk_path(path, frame_idx)
-        if os.path.exists(dp):
+    def set_capacity(self, visible_tiles: int):
+        self.max_items = max(MEM_CACHE_MIN, 4 * visible_tiles)
+        self._evict()
+
+    def _remember(self, k: Tuple[str,int,int], data: bytes):
+        self.mem[k] = data
+        self.mem.move_to_end(k)
+        self._evict()
+
+    def _evict(self):
+        while len(self.mem) > self.max_items:
+            self.mem.popitem(last=False)
+
+    def _frame(self, data: bytes) -> Image.Image:
+        return Image.frombuffer("RGB", (self.size, self.size), data, "raw", "RGB", 0, 1)
+
+    def disk_path(self, seq: SequenceItem) -> str:
+        h = _key_hash(f"{seq.key}|{self.size}|{len(seq.frames)}")
+        return os.path.join(self.cache_dir, f"{h}.atlas")
+
+    def _atlas(self, seq: SequenceItem) -> Optional[ThumbAtlas]:
+        # caller holds atlas_lock
+        if self.closed:
+            return None
+        if seq.key in self.atlases:
+            self.atlases.move_to_end(seq.key)
+            return self.atlases[seq.key]
+        try:
+            atlas = ThumbAtlas(self.disk_path(seq), self.size, len(seq.frames))
+        except (OSError, ValueError):
+            atlas = None
+        self.atlases[seq.key] = atlas
+        while len(self.atlases) > ATLAS_OPEN_MAX:
+            _, old = self.atlases.popitem(last=False)
+            if old:
+                old.close()
+        return atlas
+
+    def close(self):
+        # drop every mmap and its fd; a worker still holding this cache just skips the disk
+        with self.atlas_lock:
+            self.closed = True
+            for atlas in self.atlases.values():
+                if atlas:
+                    atlas.close()
+            self.atlases.clear()
+
+    def contains(self, seq: SequenceItem, frame_idx: int) -> bool:
+        if self.key(seq.frames[frame_idx], frame_idx) in self.mem:
+            return True
+        with self.atlas_lock:
+            atlas = self._atlas(seq)
+            return bool(atlas and atlas.has(frame_idx))
+
+    def get(self, seq: SequenceItem, frame_idx: int) -> Optional[Image.Image]:
+        k = self.key(seq.frames[frame_idx], frame_idx)
+        data = self.mem.get(k)
+        if data is not None:
+            self.mem.move_to_end(k)
+            return self._frame(data)
+        with self.atlas_lock:
+            atlas = self._atlas(seq)
+            im = atlas.get(frame_idx) if atlas else None
+        if im is not None:
+            self._remember(k, im.tobytes())
+        return im
+
+    def store(self, seq: SequenceItem, frame_idx: int, image_rgb: Image.Image) -> bool:
+        # worker side: disk only, no Tk objects; False when the sequence has no atlas
+        with self.atlas_lock:
+            atlas = self._atlas(seq)
+            if atlas is None:
+                return False
+            atlas.put(frame_idx, image_rgb)
+            return True
+
+    def put(self, seq: SequenceItem, frame_idx: int, image_rgb: Image.Image):
+        # Tk thread only
+        self._remember(self.key(seq.frames[frame_idx], frame_idx), image_rgb.tobytes())
+
+class LoadTask:
+    __slots__ = ("fn", "args", "cancelled", "started", "__weakref__")
+
+    def __init__(self, fn: Callable, args: tuple):
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self.started = False
+
+# persistent workers fed from one PriorityQueue; lower priority value runs first
+class FrameLoader:
+    def __init__(self, workers: int):
+        self.tasks = queue.PriorityQueue()
+        self._order = itertools.count()
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit_batch(self, jobs: Iterable[Tuple[float, LoadTask]]):
+        for priority, task in jobs:
+            self.tasks.put((priority, next(self._order), task))
+
+    def _run(self):
+        while True:
+            _, _, task = self.tasks.get()
+            if task.cancelled:
+                continue  # tile scrolled away before we got to it
+            task.started = True
             try:
-                im = Image.open(dp)
-                ph = ImageTk.PhotoImage(im)
-                self.mem[k] = ph
-                return ph
+                task.fn(*task.args)
             except Exception:
                 pass
-        return None
-
-    def put(self, path: str, frame_idx: int, image_rgb: Image.Image) -> ImageTk.PhotoImage:
-        k = self.key(path, frame_idx)
-        ph = ImageTk.PhotoImage(image_rgb)
-        self.mem[k] = ph
-        dp = self.disk_path(path, frame_idx)
-        try:
-            image_rgb.save(dp, format="PNG")
-        except Exception:
-            pass
-        return ph
 
 class SequenceWallApp(tk.Tk):
     def __init__(self):
@@ -161,13 +409,22 @@ class SequenceWallApp(tk.Tk):
 
         self.sequences: List[SequenceItem] = []
         self.tiles: List['SeqTile'] = []
-        self.pool = ThreadPoolExecutor(max_workers=max(2, os.cpu_count()//2))
+        self.loader = FrameLoader(workers=max(2, os.cpu_count()//2))
+        self.scan_pool = ThreadPoolExecutor(max_workers=1)
+        self._scan_gen = 0
+        self.scan_events = queue.SimpleQueue()  # (handler, *args) from the scan thread
+        self.image_queue = queue.SimpleQueue()
+        self.pending_draws: Dict['SeqTile', Image.Image] = {}
+        self._settled_view: Optional[Tuple[int,int]] = None  # viewport whose tiles all have a frame
 
         self._suppress_tree_select = False
+        self._subdir_cache: Dict[str, Tuple[float, bool]] = {}
 
         self._build_header()
         self._build_body()
+        self._next_tick = time.monotonic()
         self._schedule_tick()
+        self._poll_results()
 
     def _build_header(self):
         header = ttk.Frame(self)
@@ -220,10 +477,9 @@ class SequenceWallApp(tk.Tk):
         self.scroll_x = ttk.Scrollbar(container, orient="horizontal", command=self.canvas.xview)
         self.canvas.configure(yscrollcommand=self.scroll_y.set, xscrollcommand=self.scroll_x.set)
 
-        self.grid_frame = ttk.Frame(self.canvas, style="TFrame")
-        self.canvas_win = self.canvas.create_window((0,0), window=self.grid_frame, anchor="nw")
-        self.grid_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-
+        # viewport height only changes on <Configure>; keep it instead of asking Tk every tick
+        self._view_h = 0
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
         self.canvas.bind("<Enter>", lambda e: self._bind_wheel(True))
         self.canvas.bind("<Leave>", lambda e: self._bind_wheel(False))
 
@@ -267,12 +523,12 @@ class SequenceWallApp(tk.Tk):
         if children and self.tree.item(children[0], "text") == "...":
             self.tree.delete(children[0])
             try:
-                for name in sorted(os.listdir(path)):
-                    full = os.path.join(path, name)
-                    if os.path.isdir(full):
-                        child = self.tree.insert(node, "end", text=name, values=(full,), open=False)
-                        if self._has_subdir(full):
-                            self.tree.insert(child, "end", text="...", values=("dummy",))
+                with os.scandir(path) as it:
+                    dirs = sorted((e.name, e.path) for e in it if e.is_dir())
+                for name, full in dirs:
+                    child = self.tree.insert(node, "end", text=name, values=(full,), open=False)
+                    if self._has_subdir(full):
+                        self.tree.insert(child, "end", text="...", values=("dummy",))
             except PermissionError:
                 pass
 
@@ -292,13 +548,18 @@ class SequenceWallApp(tk.Tk):
         return None if v == "dummy" else v
 
     def _has_subdir(self, path: str) -> bool:
+        now = time.monotonic()
+        hit = self._subdir_cache.get(path)
+        if hit and now - hit[0] < SUBDIR_CACHE_TTL:
+            return hit[1]
+        found = False
         try:
-            for name in os.listdir(path):
-                if os.path.isdir(os.path.join(path, name)):
-                    return True
+            with os.scandir(path) as it:
+                found = any(e.is_dir() for e in it)
         except Exception:
-            return False
-        return False
+            pass
+        self._subdir_cache[path] = (now, found)
+        return found
 
     def choose_dir(self):
         d = filedialog.askdirectory(initialdir=self.path_var.get() or os.path.expanduser("~"))
@@ -370,197 +631,397 @@ class SequenceWallApp(tk.Tk):
             self._suppress_tree_select = False
 
     def _scan_and_show(self, root: str):
+        # scan off the Tk thread; progress and the result come back through scan_events
         self.status_var.set(f"扫描中… {root}")
-        self.update_idletasks()
-        self.sequences = find_sequences(root)
+        self._scan_gen += 1
+        gen = self._scan_gen
+
+        fut = self.scan_pool.submit(find_sequences, root,
+                                    lambda n: self.scan_events.put((self._on_scan_progress, gen, root, n)),
+                                    lambda: gen != self._scan_gen)  # a newer Load stops this walk early
+        fut.add_done_callback(lambda f: self.scan_events.put((self._on_scan_done, gen, root, f)))
+
+    def _on_scan_progress(self, gen: int, root: str, n: int):
+        if gen == self._scan_gen:
+            self.status_var.set(f"扫描中… {root} — 已找到 {n} 组")
+
+    def _on_scan_done(self, gen: int, root: str, fut):
+        if gen != self._scan_gen:
+            return  # a newer scan was started meanwhile
+        try:
+            self.sequences = fut.result()
+        except Exception as e:
+            self.status_var.set(f"扫描失败: {e} — {root}")
+            return
         self.status_var.set(f"找到 {len(self.sequences)} 组序列 — {root}")
-        self.thumb_cache = ThumbCache(root, size=int(self.tile_var.get()))
+        self._set_cache(ThumbCache(root, size=int(self.tile_var.get())))
         self._populate_tiles()
 
     def _populate_tiles(self):
-        for w in self.grid_frame.winfo_children():
-            w.destroy()
+        for t in self.tiles:
+            t.destroy()
         self.tiles.clear()
         if not self.sequences:
+            self.canvas.configure(scrollregion=(0, 0, 0, 0))
             return
-        cols = max(1, int(self.cols_var.get()))
         size = max(40, int(self.tile_var.get()))
-        for i, seq in enumerate(self.sequences):
-            r, c = divmod(i, cols)
-            tile = SeqTile(self.grid_frame, seq, size=size, cache=self.thumb_cache, pool=self.pool)
-            tile.grid(row=r, column=c, padx=4, pady=4, sticky="nsew")
-            self.tiles.append(tile)
-        for ci in range(cols):
-            self.grid_frame.grid_columnconfigure(ci, weight=1)
+        for seq in self.sequences:
+            self.tiles.append(SeqTile(self.canvas, seq, size=size, cache=self.thumb_cache,
+                                      results=self.image_queue, draws=self.pending_draws))
+        self.relayout()
 
     def on_tile_size_change(self):
         size = max(40, int(self.tile_var.get()))
         if self.current_root:
-            self.thumb_cache = ThumbCache(self.current_root, size=size)
+            self._set_cache(ThumbCache(self.current_root, size=size))
         for t in self.tiles:
             t.set_size(size, new_cache=self.thumb_cache)
+        self.relayout()
+
+    def _set_cache(self, cache: ThumbCache):
+        # the old cache's atlases each hold an fd; close them instead of waiting for GC
+        if self.thumb_cache is not None:
+            self.thumb_cache.close()
+        self.thumb_cache = cache
 
     def relayout(self):
+        self._settled_view = None
         if not self.tiles:
             return
         cols = max(1, int(self.cols_var.get()))
+        size = self.tiles[0].size
+        cell_w = size + 2 + 2 * TILE_PAD
+        cell_h = size + CAPTION_H + 2 + 2 * TILE_PAD
         for i, t in enumerate(self.tiles):
             r, c = divmod(i, cols)
-            t.grid_configure(row=r, column=c)
-        for ci in range(cols):
-            self.grid_frame.grid_columnconfigure(ci, weight=1)
+            t.place(c * cell_w + TILE_PAD, r * cell_h + TILE_PAD)
+        rows = (len(self.tiles) + cols - 1) // cols
+        self.canvas.configure(scrollregion=(0, 0, cols * cell_w, rows * cell_h))
 
     def set_animate(self, flag: bool):
         self.animate_var.set(flag)
 
+    def _on_canvas_configure(self, event):
+        self._view_h = event.height
+
     def _visible_y_range(self) -> Tuple[int,int]:
-        bbox = self.canvas.bbox("all")
-        if not bbox:
-            return (0,0)
         y0 = int(self.canvas.canvasy(0))
-        y1 = y0 + int(self.canvas.winfo_height())
-        return (y0, y1)
+        return (y0, y0 + self._view_h)
 
     def _schedule_tick(self):
         fps = max(1.0, float(self.fps_var.get()))
-        interval = int(1000 / fps)
+        period = 1.0 / fps
         self._tick()
-        self.after(interval, self._schedule_tick)
+        if self.pending_draws:
+            # apply every frame change of this tick together, in one idle pass
+            self.after_idle(self._flush_updates, self._take_draws())
+        # keep the cadence on absolute time; after an overrun skip the missed ticks instead of stacking them
+        self._next_tick += period
+        now = time.monotonic()
+        if now > self._next_tick:
+            self._next_tick += (int((now - self._next_tick) / period) + 1) * period
+        delay_ms = max(1, int((self._next_tick - now) * 1000))
+        self.after(delay_ms, self._schedule_tick)
+
+    def _poll_results(self):
+        # a short fixed poll, so at low FPS loaded frames still reach the wall right away
+        self._drain_scan_events()
+        self._drain_image_queue()
+        if self.pending_draws:
+            self._flush_updates(self._take_draws())
+        self.after(DRAIN_POLL_MS, self._poll_results)
+
+    def _drain_scan_events(self):
+        while True:
+            try:
+                handler, *args = self.scan_events.get_nowait()
+            except queue.Empty:
+                break
+            handler(*args)
+
+    def _drain_image_queue(self):
+        # Tk updates stay on the Tk thread; workers only decode/resize.
+        # Prefetch completions carry no image and don't count against the per-poll budget.
+        shown = 0
+        while shown < DRAIN_PER_POLL:
+            try:
+                tile, frame_idx, result, show = self.image_queue.get_nowait()
+            except queue.Empty:
+                break
+            shown += show
+            if tile.alive:
+                tile.on_loaded(frame_idx, result, show)
+
+    def _take_draws(self) -> Dict['SeqTile', Image.Image]:
+        batch = dict(self.pending_draws)
+        self.pending_draws.clear()
+        return batch
+
+    def _flush_updates(self, batch: Dict['SeqTile', Image.Image]):
+        for tile, image_rgb in batch.items():
+            if tile.alive and image_rgb.width == tile.size:
+                tile._show(image_rgb)
 
     def _tick(self):
         if not self.tiles:
             return
-        y0, y1 = self._visible_y_range()
-        step = max(1, int(self.frame_step.get()))
+        if self.state() == "iconic" or not self.winfo_viewable():
+            return
         play = self.animate_var.get()
+        view = self._visible_y_range()
+        if not play and view == self._settled_view:
+            return  # every on-screen tile is done; nothing changes until a scroll or playback
+        y0, y1 = view
+        center = (y0 + y1) / 2
+        step = max(1, int(self.frame_step.get()))
+        jobs = []
+        visible = 0
+        settled = True
         for t in self.tiles:
-            ty = t.winfo_y()
-            th = t.winfo_height() or (t.size + 32)
-            if (ty < y1 and ty + th > y0):
-                t.ensure_first_frame_loaded()
-                if play:
-                    t.step(step=step)
+            ty = t.y
+            th = t.height
+            if not (ty < y1 and ty + th > y0):
+                t.cancel_pending()
+                continue
+            visible += 1
+            need = t.ensure_first_frame_loaded()
+            if play:
+                need = t.step(step=step) or need
+            # tiles nearest the middle of the viewport load first
+            priority = abs(ty + th / 2 - center)
+            if need:
+                jobs.append((priority, t.make_task(*need)))
+            if not (t.first_loaded or t.failed):
+                settled = False
+            if play and t.first_loaded and t.idx % 4 == 0:
+                for k, task in enumerate(t.prefetch_window(PREFETCH_FRAMES, step)):
+                    jobs.append((PREFETCH_PRIORITY + priority + k, task))
+        self._settled_view = view if settled and not play else None
+        if self.thumb_cache:
+            self.thumb_cache.set_capacity(visible)
+        if jobs:
+            self.loader.submit_batch(jobs)
 
     def _on_mousewheel(self, event):
         delta = -1*(event.delta//120)*40
         self.canvas.yview_scroll(int(delta/40), "units")
 
-class SeqTile(ttk.Frame):
-    def __init__(self, parent, seq: SequenceItem, size=200, cache: Optional[ThumbCache]=None, pool=None):
-        super().__init__(parent, style="TFrame")
-        self.grid_propagate(False)
-        self.pack_propagate(False)
-        self.seq = seq
-        self.size = size
-        self.idx = 0
-        self.running = True
-        self.cache = cache
-        self.pool = pool
-        self.loading_first = False
-        self.first_loaded = False
-
-        outer = tk.Frame(self, bg=BORDER, width=size+2, height=size+32, highlightthickness=0, bd=0)
-        outer.pack(fill=tk.BOTH, expand=False)
-        outer.pack_propagate(False)
-
-        inner = tk.Frame(outer, bg=BG_TILE, highlightthickness=0, bd=0)
-        inner.pack(fill=tk.BOTH, expand=True, padx=1, pady=1)
-        inner.pack_propagate(False)
-
-        self.canvas = tk.Canvas(inner, width=size, height=size, bg=BG_TILE, highlightthickness=0, bd=0)
-        self.canvas.pack(side=tk.TOP, anchor="center")
-        self.canvas.pack_propagate(False)
-
-        self.caption = tk.Label(inner, text=self._caption_text(), bg=BG_TILE, fg=FG_TEXT, anchor="center")
-        self.caption.pack(fill=tk.X)
-        self.caption.configure(wraplength=size, justify="center")
-
-        self.canvas.bind("<Button-1>", self._toggle)
-        self.caption.bind("<Button-1>", self._toggle)
-
-        self.set_size(size)
+def _elide_left(text: str, font: tkfont.Font, width: int) -> str:
+    # keep the tail (prefix, pattern, frame count) and drop the front of the folder name
+    if font.measure(text) <= width:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if font.measure("…" + text[mid:]) <= width:
+            hi = mid
+        else:
+            lo = mid + 1
+    return "…" + text[lo:]
+
+# one tile on the shared wall canvas: a border rectangle, an image item and a caption
+@dataclass(eq=False)
+class SeqTile:
+    canvas: tk.Canvas
+    seq: SequenceItem
+    results: "queue.SimpleQueue"  # shared with the app, which drains it on the Tk thread
+    size: int = 200
+    cache: Optional[ThumbCache] = None
+    draws: Optional[Dict['SeqTile', Image.Image]] = None  # shared per-tick batch, None = draw now
+    x: int = 0
+    y: int = 0
+    idx: int = 0
+    running: bool = True
+    first_loaded: bool = False
+    loading_first: bool = False
+    failed: bool = False  # frame 0 could not be decoded; don't keep requesting it
+    alive: bool = True
+    tag: str = ""
+    click_bind: str = ""
+    border_item: int = 0
+    img_item: int = 0
+    text_item: int = 0
+    msg_item: Optional[int] = None
+    pending: "weakref.WeakSet[LoadTask]" = field(default_factory=weakref.WeakSet)
+    prefetching: Dict[int, LoadTask] = field(default_factory=dict)  # frame index -> queued prefetch
+    # one PhotoImage per tile; frames are pasted into it instead of allocating new ones
+    _ph: Optional["ImageTk.PhotoImage"] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.tag = f"tile{id(self)}"
+        self.border_item = self.canvas.create_rectangle(0, 0, 0, 0, fill=BG_TILE, outline=BORDER, tags=self.tag)
+        self.img_item = self.canvas.create_image(0, 0, anchor="nw", tags=self.tag)
+        # single line: wrapped text would spill into the next row (CAPTION_H is fixed)
+        self.text_item = self.canvas.create_text(0, 0, text="", fill=FG_TEXT, font="TkDefaultFont",
+                                                 anchor="n", tags=self.tag)
+        self.click_bind = self.canvas.tag_bind(self.tag, "<Button-1>", self._toggle)
+        self.set_size(self.size)
+
+    @property
+    def height(self) -> int:
+        return self.size + CAPTION_H + 2
 
     def _caption_text(self):
         rel = os.path.basename(self.seq.folder)
         return f"{rel}/{self.seq.prefix}[{self.seq.digits*'#'}].{self.seq.ext}  ({len(self.seq.frames)}f)"
 
+    def place(self, x: int, y: int):
+        self.x, self.y = x, y
+        s = self.size
+        self.canvas.coords(self.border_item, x, y, x + s + 1, y + self.height - 1)
+        self.canvas.coords(self.img_item, x + 1, y + 1)
+        self.canvas.coords(self.text_item, x + 1 + s // 2, y + s + 4)
+        if self.msg_item is not None:
+            self.canvas.coords(self.msg_item, x + 1 + s // 2, y + 1 + s // 2)
+
+    def destroy(self):
+        self.alive = False
+        self.cancel_pending()
+        # the Tcl command behind tag_bind holds this tile (and its PhotoImage) alive
+        self.canvas.tag_unbind(self.tag, "<Button-1>", self.click_bind)
+        self.canvas.delete(self.tag)
+
     def set_size(self, size: int, new_cache: Optional[ThumbCache]=None):
+        if self._ph is None or size != self.size:
+            if self._ph is not None:
+                self.first_loaded = False  # the blank new surface needs a frame
+            self._ph = _get_imagetk().PhotoImage("RGB", (size, size))
+            self.canvas.itemconfigure(self.img_item, image=self._ph)
+            caption = _elide_left(self._caption_text(), tkfont.nametofont("TkDefaultFont", root=self.canvas), size)
+            self.canvas.itemconfigure(self.text_item, text=caption)
         self.size = size
         if new_cache is not None:
             self.cache = new_cache
-        total_h = size + 30
-        self.configure(width=size+2, height=total_h+2)
-        for child in self.winfo_children():
-            try:
-                child.configure(width=size+2, height=total_h+2)
-            except tk.TclError:
-                pass
-        self.canvas.config(width=size, height=size)
-        self.caption.configure(wraplength=size)
+        self.place(self.x, self.y)
 
     def _toggle(self, *_):
         self.running = not self.running
 
-    def ensure_first_frame_loaded(self):
-        if self.first_loaded or self.loading_first or not self.seq.frames:
-            return
+    # ensure_first_frame_loaded/step draw from cache when they can, otherwise
+    # return the (path, frame_idx) the caller has to schedule for loading
+    def ensure_first_frame_loaded(self) -> Optional[Tuple[str, int]]:
+        if self.first_loaded or self.loading_first or self.failed or not self.seq.frames:
+            return None
         self.loading_first = True
         path = self.seq.frames[0]
         if self.cache:
-            ph = self.cache.get(path, 0)
-            if ph:
-                self._draw_photo(ph)
+            im = self.cache.get(self.seq, 0)
+            if im is not None:
+                self._draw_photo(im)
                 self.first_loaded = True
                 self.loading_first = False
-                return
-        if self.pool:
-            self.pool.submit(self._load_and_cache, path, 0)
-        else:
-            self._load_and_cache(path, 0)
+                return None
+        return (path, 0)
+
+    def make_task(self, path: str, frame_idx: int, show: bool = True) -> LoadTask:
+        task = LoadTask(self._load_and_cache, (path, frame_idx, show))
+        self.pending.add(task)
+        return task
+
+    def prefetch_window(self, n: int = PREFETCH_FRAMES, step: int = 1) -> List[LoadTask]:
+        # tasks for the next n frames in play order that are neither cached nor already requested
+        if not self.cache or not self.seq.frames:
+            return []
+        out = []
+        count = len(self.seq.frames)
+        for k in range(1, n + 1):
+            i = (self.idx + k * step) % count
+            if i in self.prefetching or self.cache.contains(self.seq, i):
+                continue
+            self.prefetching[i] = task = self.make_task(self.seq.frames[i], i, show=False)
+            out.append(task)
+        return out
+
+    def cancel_pending(self):
+        self.prefetching.clear()
+        if not self.pending:
+            return
+        for task in list(self.pending):
+            task.cancelled = True
+        self.pending.clear()
+        if not self.first_loaded:
+            self.loading_first = False  # request frame 0 again when visible
 
-    def _load_and_cache(self, path: str, frame_idx: int):
+    def _load_and_cache(self, path: str, frame_idx: int, show: bool = True):
+        # runs on a worker: no Tk calls here, results go back through self.results
+        size, cache = self.size, self.cache
+        if not show and cache and cache.contains(self.seq, frame_idx):
+            self.results.put((self, frame_idx, None, False))  # cached since it was queued
+            return
         try:
-            from PIL import Image
-            im = Image.open(path).convert("RGBA")
-            pm = resize_rgba_contain_premultiplied(im, (self.size, self.size))
-            composed = compose_on_bg(pm, self.size, BG_TILE)
-            if self.cache:
-                ph = self.cache.put(path, frame_idx, composed)
-            else:
-                ph = ImageTk.PhotoImage(composed)
-            self.canvas.after(0, self._draw_photo, ph)
-            self.first_loaded = True
+            im = decode_frame(path, size)
+            pm = resize_rgba_contain_premultiplied(im, (size, size))
+            composed = compose_on_bg(pm, size, BG_TILE)
+            stored = bool(cache) and cache.store(self.seq, frame_idx, composed)
+            # a prefetch that made it into the atlas only reports completion
+            self.results.put((self, frame_idx, None if stored and not show else composed, show))
         except Exception as e:
-            self.canvas.after(0, self._draw_text, f"Error:\n{e}")
-        finally:
-            self.loading_first = False
+            self.results.put((self, frame_idx, e, show))
+
+    def on_loaded(self, frame_idx: int, result, show: bool = True):
+        if not show:
+            self.prefetching.pop(frame_idx, None)
+            if isinstance(result, Exception):
+                return
+            if result is not None and result.width == self.size and self.cache:
+                self.cache.put(self.seq, frame_idx, result)  # no atlas: keep it in memory
+            if frame_idx == self.idx and self.first_loaded and self.cache:
+                im = self.cache.get(self.seq, frame_idx)  # step() was waiting on this frame
+                if im is not None:
+                    self._draw_photo(im)
+            return
+        self.loading_first = False
+        if isinstance(result, Exception):
+            self.failed = self.failed or not self.first_loaded
+            self._draw_text(f"Error:\n{result}")
+            return
+        if result.width != self.size:
+            return  # resized while this frame was loading
+        if self.cache:
+            self.cache.put(self.seq, frame_idx, result)
+        self._draw_photo(result)
+        self.first_loaded = True
 
     def _draw_text(self, s: str):
-        self.canvas.delete("all")
-        self.canvas.create_text(self.size//2, self.size//2, text=s, fill=FG_TEXT)
+        if self.msg_item is not None:
+            self.canvas.delete(self.msg_item)
+        self.canvas.itemconfigure(self.img_item, state="hidden")
+        self.msg_item = self.canvas.create_text(self.x + 1 + self.size//2, self.y + 1 + self.size//2,
+                                                text=s, fill=FG_TEXT, width=self.size, tags=self.tag)
+
+    def _draw_photo(self, image_rgb: Image.Image):
+        if self.draws is not None:
+            self.draws[self] = image_rgb  # last frame of the tick wins
+        else:
+            self._show(image_rgb)
 
-    def _draw_photo(self, ph: ImageTk.PhotoImage):
-        self.canvas.delete("all")
-        self.canvas.create_image(self.size//2, self.size//2, image=ph)
-        self.canvas.image = ph
+    def _show(self, image_rgb: Image.Image):
+        if self.msg_item is not None:
+            self.canvas.delete(self.msg_item)
+            self.canvas.itemconfigure(self.img_item, state="normal")
+            self.msg_item = None
+        self._ph.paste(image_rgb)
 
-    def step(self, step: int = 1):
+    def step(self, step: int = 1) -> Optional[Tuple[str, int]]:
         if not self.running or not self.seq.frames:
-            return
+            return None
         if not self.first_loaded:
-            self.ensure_first_frame_loaded()
-            return
+            return self.ensure_first_frame_loaded()
         self.idx = (self.idx + step) % len(self.seq.frames)
         path = self.seq.frames[self.idx]
         if self.cache:
-            ph = self.cache.get(path, self.idx)
-            if ph:
-                self._draw_photo(ph)
-                return
-        if self.pool:
-            self.pool.submit(self._load_and_cache, path, self.idx)
-        else:
-            self._load_and_cache(path, self.idx)
+            im = self.cache.get(self.seq, self.idx)
+            if im is not None:
+                self._draw_photo(im)
+                return None
+        task = self.prefetching.get(self.idx)
+        if task is not None:
+            if task.started:
+                return None  # already decoding; on_loaded draws it when it lands
+            # still queued behind on-screen work: drop it and load at normal priority
+            task.cancelled = True
+            del self.prefetching[self.idx]
+        return (path, self.idx)
 
 if __name__ == "__main__":
     app = SequenceWallApp()